@@ -31,6 +31,18 @@ class Settings(BaseSettings):
     # AutoDev settings
     max_attempts: int = 3
     max_diff_lines: int = 300
+    # Approximate input token budget for file contents sent to execute_issue.
+    max_context_tokens: int = 100_000
+    # Approximate token budget for the repository tree sent to plan_issue.
+    max_repository_context_tokens: int = 8_000
+
+    # Validate planning tool-call arguments against PlanModel. When disabled,
+    # arguments are only checked for PlanModel's required fields.
+    strict_validation: bool = True
+
+    # Anthropic rate limits enforced client-side before each planning request
+    anthropic_rpm: int = 50
+    anthropic_tpm: int = 40_000
 
     class Config:
         env_file = ".env"
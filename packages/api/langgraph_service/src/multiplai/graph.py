@@ -12,26 +12,42 @@ from __future__ import annotations
 
 import copy
 import inspect
+import pickle
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
 
-from multiplai.types import GraphState
+from multiplai.schemas import Complexity
+from multiplai.types import GraphState, Plan
 
 END = "__end__"
 
 
 class MemorySaver:
-    """A minimal in-memory checkpointer compatible with this module's graph."""
+    """A minimal in-memory checkpointer compatible with this module's graph.
+
+    Checkpoints are stored as pickled snapshots, which is much cheaper than
+    `copy.deepcopy` and keeps stored state isolated from later mutation. State
+    that pickle cannot handle (e.g. a mock or locally defined issue object) is
+    stored as a deep copy instead.
+    """
 
     def __init__(self) -> None:
-        self._store: Dict[str, GraphState] = {}
+        self._store: Dict[str, Union[bytes, GraphState]] = {}
 
     def get(self, thread_id: str) -> Optional[GraphState]:
         value = self._store.get(thread_id)
-        return copy.deepcopy(value) if value is not None else None
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            state: GraphState = pickle.loads(value)
+            return state
+        return copy.deepcopy(value)
 
     def put(self, thread_id: str, state: GraphState) -> None:
-        self._store[thread_id] = copy.deepcopy(state)
+        try:
+            self._store[thread_id] = pickle.dumps(state, protocol=5)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            self._store[thread_id] = copy.deepcopy(state)
 
 
 NodeFn = Callable[
@@ -46,11 +62,14 @@ class _CompiledGraph:
     edges: Dict[str, str]
     entry_point: str
     checkpointer: MemorySaver
+    # (node, is_async) pairs in execution order, resolved once at compile time.
+    sequence: Tuple[Tuple[NodeFn, bool], ...]
+    # When False, only the initial and final states are checkpointed.
+    checkpoint_each_step: bool = True
 
     async def ainvoke(
         self, state: GraphState, config: Optional[Dict[str, Any]] = None
     ) -> GraphState:
-        current = self.entry_point
         thread_id = "default"
         if config is not None:
             thread_id = (
@@ -59,25 +78,36 @@ class _CompiledGraph:
                 or thread_id
             )
 
-        working_state: GraphState = copy.deepcopy(state)
-        self.checkpointer.put(thread_id, working_state)
+        # Round-trip through the checkpointer so the caller's state is never mutated.
+        self.checkpointer.put(thread_id, state)
+        working_state = self.checkpointer.get(thread_id)
+        assert working_state is not None
 
-        while current != END:
-            node = self.nodes[current]
+        last_step = len(self.sequence) - 1
+        for step, (node, is_async) in enumerate(self.sequence):
             result = node(working_state)
-            if inspect.isawaitable(result):
-                result = await result
+            if is_async or inspect.isawaitable(result):
+                # Sync callables may still return an awaitable (e.g. a lambda
+                # wrapping a coroutine function), so they keep the check.
+                result = await result  # type: ignore[misc]
             if result:
                 # Treat the node output as a partial state update.
-                for key, value in result.items():
-                    working_state[key] = value  # type: ignore[literal-required]
-            self.checkpointer.put(thread_id, working_state)
-
-            current = self.edges.get(current, END)
+                working_state.update(result)  # type: ignore[typeddict-item]
+                if self.checkpoint_each_step and step != last_step:
+                    self.checkpointer.put(thread_id, working_state)
 
+        # Nodes may also mutate the state in place, so always checkpoint the end state.
+        self.checkpointer.put(thread_id, working_state)
         return working_state
 
 
+def _is_async_node(fn: NodeFn) -> bool:
+    """Tell whether calling `fn` always returns a coroutine."""
+    return inspect.iscoroutinefunction(fn) or (
+        not inspect.isroutine(fn) and inspect.iscoroutinefunction(type(fn).__call__)
+    )
+
+
 class StateGraph:
     """A small subset of a StateGraph API.
 
@@ -100,7 +130,9 @@ class StateGraph:
     def add_edge(self, source: str, dest: str) -> None:
         self._edges[source] = dest
 
-    def compile(self, checkpointer: MemorySaver) -> _CompiledGraph:
+    def compile(
+        self, checkpointer: MemorySaver, checkpoint_each_step: bool = True
+    ) -> _CompiledGraph:
         if not self._entry_point:
             raise ValueError("Entry point must be set before compiling")
         return _CompiledGraph(
@@ -108,8 +140,31 @@ class StateGraph:
             edges=dict(self._edges),
             entry_point=self._entry_point,
             checkpointer=checkpointer,
+            sequence=self._linear_sequence(self._entry_point),
+            checkpoint_each_step=checkpoint_each_step,
         )
 
+    def _linear_sequence(self, entry_point: str) -> Tuple[Tuple[NodeFn, bool], ...]:
+        """Follow edges from `entry_point` to END, returning the nodes in order.
+
+        Each node is paired with whether it is a coroutine function (or an
+        object with an async `__call__`), so the runner does not need to
+        inspect those nodes' results.
+        """
+        sequence = []
+        visited = set()
+        current = entry_point
+        while current != END:
+            if current in visited:
+                raise ValueError(f"Cycle detected at node '{current}'")
+            if current not in self._nodes:
+                raise ValueError(f"Unknown node '{current}'")
+            visited.add(current)
+            node = self._nodes[current]
+            sequence.append((node, _is_async_node(node)))
+            current = self._edges.get(current, END)
+        return tuple(sequence)
+
 
 def _append_trace(state: GraphState, node_name: str) -> None:
     trace = state.get("trace")
@@ -127,17 +182,19 @@ async def load_context(state: GraphState) -> Dict[str, Any]:
     }
 
 
+# Immutable so no run can alter the plan later runs start from.
+_PLACEHOLDER_STEPS = ("execute", "create_pr")
+
+
 async def plan_issue(state: GraphState) -> Dict[str, Any]:
     _append_trace(state, "plan_issue")
-    return {
-        "status": "planned",
-        "plan": {
-            "steps": ["execute", "create_pr"],
-            "definition_of_done": [],
-            "target_files": [],
-            "estimated_complexity": "low",
-        },
+    plan: Plan = {
+        "steps": list(_PLACEHOLDER_STEPS),
+        "definition_of_done": [],
+        "target_files": [],
+        "estimated_complexity": Complexity.LOW,
     }
+    return {"status": "planned", "plan": plan}
 
 
 async def execute_issue(state: GraphState) -> Dict[str, Any]:
@@ -0,0 +1,83 @@
+"""Shared LLM client for MultiplAI nodes.
+
+Planning and execution talk to the same Anthropic model, so they share a single
+cached client (and its HTTP connection pool) per process. Tool-forced
+bindings of that client are cached per schema as well. The langchain runtime is
+imported lazily, on first use. The rough token estimate both nodes budget their
+prompts with lives here too.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from multiplai.config import get_settings
+from multiplai.rate_limit import AsyncRateLimiter
+
+if TYPE_CHECKING:
+    from anthropic import AsyncAnthropic  # type: ignore[import-not-found]
+    from langchain_anthropic import ChatAnthropic  # type: ignore[import-not-found]
+    from langchain_core.runnables import Runnable  # type: ignore[import-not-found]
+
+ANTHROPIC_MODEL = "claude-3-5-sonnet-20240620"
+
+# Token counts are estimated from length since Anthropic has no local tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Roughly estimate the number of LLM tokens in `texts`."""
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> ChatAnthropic:
+    """Get a cached Anthropic client so HTTP connections are reused across calls."""
+    from langchain_anthropic import ChatAnthropic  # type: ignore[import-not-found]
+
+    settings = get_settings()
+    return ChatAnthropic(
+        api_key=settings.anthropic_api_key,
+        model=ANTHROPIC_MODEL,
+        max_retries=2,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_anthropic() -> AsyncAnthropic:
+    """Get a cached raw Anthropic client for APIs langchain does not wrap (e.g. batches)."""
+    from anthropic import AsyncAnthropic  # type: ignore[import-not-found]
+
+    return AsyncAnthropic(api_key=get_settings().anthropic_api_key, max_retries=2)
+
+
+@lru_cache(maxsize=1)
+def get_rate_limiter() -> AsyncRateLimiter:
+    """Get the process-wide limiter for the configured Anthropic RPM/TPM."""
+    settings = get_settings()
+    return AsyncRateLimiter(settings.anthropic_rpm, settings.anthropic_tpm)
+
+
+@lru_cache(maxsize=8)
+def get_tool_llm(schema: type) -> Runnable[Any, Any]:
+    """Get the shared client forced to call `schema` as a tool, built once per schema.
+
+    Unlike `with_structured_output`, no output parser is attached: callers read
+    the arguments from the response's single `tool_calls` entry.
+    """
+    return get_llm().bind_tools([schema], tool_choice={"type": "tool", "name": schema.__name__})
+
+
+async def close_llm() -> None:
+    """Release the shared clients, e.g. on shutdown; later calls build new ones.
+
+    Only the raw Anthropic client's connections are closed. ChatAnthropic's
+    HTTP client is a process-wide default owned by langchain-anthropic and
+    shared by every ChatAnthropic instance, so closing it would break them all.
+    """
+    if get_async_anthropic.cache_info().currsize:
+        await get_async_anthropic().close()
+    get_tool_llm.cache_clear()
+    get_llm.cache_clear()
+    get_async_anthropic.cache_clear()
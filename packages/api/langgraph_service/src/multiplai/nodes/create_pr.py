@@ -6,17 +6,29 @@ pull request from the generated diff.
 
 from __future__ import annotations
 
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
+
 from multiplai.types import GraphState
 
+# Read-only placeholder PR metadata; each state gets its own (picklable) copy.
+_PLACEHOLDER_PR: Mapping[str, Any] = MappingProxyType(
+    {
+        "number": 1,
+        "html_url": "https://github.com/example/repo/pull/1",
+        "state": "open",
+    }
+)
 
-async def create_pr(state: GraphState) -> GraphState:
+
+async def create_pr(state: GraphState) -> Dict[str, Any]:
     """Create a pull request from the generated diff.
 
     Args:
         state: Current graph state with diff.
 
     Returns:
-        Updated graph state with:
+        A partial state update with:
         - status set to 'pr_created'
         - pr_url containing the PR URL
         - pr_data containing PR metadata
@@ -24,12 +36,8 @@ async def create_pr(state: GraphState) -> GraphState:
     # Placeholder implementation
     # In the future, this will use GitHub API to create the PR
 
-    updated_state = GraphState(**state)
-    updated_state["status"] = "pr_created"
-    updated_state["pr_url"] = "https://github.com/example/repo/pull/1"
-    updated_state["pr_data"] = {
-        "number": 1,
-        "html_url": "https://github.com/example/repo/pull/1",
-        "state": "open",
+    return {
+        "status": "pr_created",
+        "pr_url": _PLACEHOLDER_PR["html_url"],
+        "pr_data": dict(_PLACEHOLDER_PR),
     }
-    return updated_state
@@ -1,114 +1,403 @@
 """Execution node that applies a planned change to a set of target files.
 
-This module currently provides a placeholder implementation that produces a
-unified diff based on the input state. In the future, this node will be wired
-to an LLM client (e.g., Anthropic) to generate real patches.
+This module contains the `execute_issue` node, which sends the plan and the
+target file contents to the shared Anthropic client and returns the generated
+unified diff.
 """
 
 from __future__ import annotations
 
-from langchain_anthropic import ChatAnthropic  # type: ignore[import-not-found]
-from langchain_core.messages import (  # type: ignore[import-not-found]
-    HumanMessage,
-    SystemMessage,
-)
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Dict, FrozenSet, List, Optional, Tuple, cast
+
+import structlog  # type: ignore[import-not-found]
 
 from multiplai.config import get_settings
+from multiplai.llm import CHARS_PER_TOKEN, estimate_tokens, get_llm
+from multiplai.schemas import Complexity
 from multiplai.types import GraphState
 
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic  # type: ignore[import-not-found]
+
+# Messages are plain role/content dicts, which ChatAnthropic accepts directly, so
+# the langchain runtime is only imported once an LLM call is actually made.
+Message = Dict[str, Any]
+
+logger = structlog.get_logger(__name__)
+
+_EPHEMERAL_CACHE: Dict[str, str] = {"type": "ephemeral"}
+
+_SYSTEM_PROMPT = (
+    "You are an expert software engineer. Your task is to generate a unified diff "
+    "to apply the planned changes to the codebase. "
+    "You will be provided with the content of the target files and the plan. "
+    "Large files may be given as line-numbered excerpts; use those line numbers "
+    "in hunk headers. "
+    "Output ONLY the unified diff. Do not include any explanations or markdown formatting."
+)
+
+# Built once so every request sends a byte-identical, prompt-cacheable prefix.
+_SYSTEM_MESSAGE: Message = {
+    "role": "system",
+    "content": [{"type": "text", "text": _SYSTEM_PROMPT, "cache_control": _EPHEMERAL_CACHE}],
+}
+
+# Oversized files are reduced to excerpts around lines that mention the plan.
+_EXCERPT_CONTEXT_LINES = 8
+_KEYWORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{3,}")
+# Plan fields whose text names the code to change. Keys and the complexity
+# level are left out so words like "steps" or "high" never pick excerpts.
+_KEYWORD_PLAN_FIELDS = ("steps", "target_files", "definition_of_done")
+
+# A response wrapped in a (possibly unterminated) ``` or ```diff fence.
+_FENCE_RE = re.compile(r"\A\s*```(?:diff)?(.*?)(?:```)?\s*\Z", re.DOTALL)
+
+# A bare ``` line (leading newline included) that closes a fenced response.
+_CLOSING_FENCE_RE = re.compile(r"\n```[ \t]*\r?\n")
+_CLOSING_FENCE_TAIL_CHARS = 16
+
+# Generated diffs keyed by a digest of the plan and target file contents, so
+# retries and replays of an unchanged issue skip the LLM round trip.
+_RESPONSE_CACHE_MAX_ENTRIES = 128
+_RESPONSE_CACHE: OrderedDict[str, str] = OrderedDict()
+
+# Decoded target files keyed by path and validated against (mtime_ns, size), so
+# unchanged files are not re-read on retries. Guarded by a lock because reads
+# run in worker threads. Larger files are not cached, which bounds the cache
+# at roughly 512 x 128 KiB = 64 MiB.
+_FILE_CACHE_MAX_ENTRIES = 512
+_FILE_CACHE_MAX_FILE_BYTES = 128 * 1024
+_FILE_CACHE: OrderedDict[str, Tuple[int, int, str]] = OrderedDict()
+_FILE_CACHE_LOCK = threading.Lock()
+
+# Caps the LLM streams in flight across all executions. Semaphores belong to
+# one event loop, so there is one per running loop.
+_MAX_CONCURRENT_REQUESTS = 8
+_REQUEST_SLOTS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _content_text(content: Any) -> str:
+    """Extract the text from a message or chunk `content` (str or content blocks)."""
+    if isinstance(content, str):
+        return content
+    texts: List[str] = []
+    for block in content:
+        if isinstance(block, str):
+            texts.append(block)
+        elif isinstance(block, dict):
+            texts.append(block.get("text", ""))
+        else:
+            texts.append(getattr(block, "text", ""))
+    return "".join(texts)
+
+
+def _closed_fence_end(text: str) -> int:
+    """Return the index just past a closed leading code fence, or -1 if not closed.
+
+    Only a ``` alone on its own, newline-terminated line closes the fence.
+    Every line inside a hunk starts with " ", "+", "-", "\\" or "@@", so fences
+    that are part of the diff's content (e.g. "+```bash" in a README) never
+    match.
+    """
+    stripped = text.lstrip()
+    if not stripped.startswith("```"):
+        return -1
+    body_start = text.find("\n", len(text) - len(stripped))
+    if body_start == -1:
+        return -1
+    closing = _CLOSING_FENCE_RE.search(text, body_start)
+    return closing.start() + 4 if closing else -1
+
+
+async def _stream_diff(llm: ChatAnthropic, messages: List[Message]) -> str:
+    """Stream a response, stopping early once a fenced diff has been closed.
+
+    Anything the model emits after the closing fence is commentary we would
+    discard anyway, so there is no need to wait for it to be generated.
+    """
+    parts: List[str] = []
+    tail = ""
+    # astream is typed as an AsyncIterator but is an async generator, which has aclose.
+    stream = cast(AsyncGenerator[Any, None], llm.astream(messages))
+    async with aclosing(stream):
+        async for chunk in stream:
+            text = _content_text(chunk.content)
+            parts.append(text)
+            # A closing fence may straddle chunks, so look at the previous tail too;
+            # most chunks contain no fence and skip the full scan.
+            window = tail + text
+            tail = window[-_CLOSING_FENCE_TAIL_CHARS:]
+            if "```" not in window or "\n" not in window:
+                continue
+            streamed = "".join(parts)
+            fence_end = _closed_fence_end(streamed)
+            if fence_end != -1:
+                return streamed[:fence_end]
+    return "".join(parts)
+
+
+def _request_slots() -> asyncio.Semaphore:
+    """Get the current event loop's semaphore limiting concurrent LLM requests."""
+    loop = asyncio.get_running_loop()
+    slots = _REQUEST_SLOTS.get(loop)
+    if slots is None:
+        slots = _REQUEST_SLOTS[loop] = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+    return slots
+
+
+async def _submit(messages: List[Message]) -> str:
+    """Send `messages` to the LLM, waiting for a free slot under the concurrency cap."""
+    async with _request_slots():
+        return await _stream_diff(get_llm(), messages)
+
+
+def _read_file(file_path: str) -> str:
+    """Read a target file; run in a worker thread to keep the event loop free.
+
+    Unchanged files (same mtime and size) are served from `_FILE_CACHE` after a
+    single `stat`. Otherwise the file is read with one unbuffered `os.read`
+    sized from `fstat` rather than the buffered text-IO stack, which is cheaper
+    for the small source files we send to the LLM. Reads continue to EOF
+    whenever that read does not return exactly the `fstat` size. Files over
+    `_FILE_CACHE_MAX_FILE_BYTES` are not cached.
+    """
+    st = os.stat(file_path)
+    with _FILE_CACHE_LOCK:
+        cached = _FILE_CACHE.get(file_path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            _FILE_CACHE.move_to_end(file_path)
+            return cached[2]
+
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        st = os.fstat(fd)
+        data = os.read(fd, st.st_size + 1)
+        if len(data) != st.st_size:
+            # A short read (reads are capped near 2 GiB, and network or FUSE file
+            # systems may return less), or the file grew after fstat or reports
+            # no size: read on until EOF.
+            chunks = [data]
+            while chunk := os.read(fd, 1 << 16):
+                chunks.append(chunk)
+            data = b"".join(chunks)
+    finally:
+        os.close(fd)
+    content = data.decode("utf-8")
+
+    with _FILE_CACHE_LOCK:
+        if len(data) > _FILE_CACHE_MAX_FILE_BYTES:
+            _FILE_CACHE.pop(file_path, None)
+            return content
+        _FILE_CACHE[file_path] = (st.st_mtime_ns, st.st_size, content)
+        _FILE_CACHE.move_to_end(file_path)
+        if len(_FILE_CACHE) > _FILE_CACHE_MAX_ENTRIES:
+            _FILE_CACHE.popitem(last=False)
+    return content
+
+
+def _excerpt_file(content: str, keywords: FrozenSet[str], max_tokens: int) -> str:
+    """Reduce `content` to line-numbered windows around lines mentioning `keywords`.
+
+    Omitted ranges are marked so the model can still address hunks by line
+    number. Falls back to the head of the file when no line matches.
+    """
+    lines = content.splitlines()
+    matches = [
+        i for i, line in enumerate(lines) if not keywords.isdisjoint(_KEYWORD_RE.findall(line))
+    ]
+    candidates = (
+        (
+            j
+            for i in matches
+            for j in range(
+                max(0, i - _EXCERPT_CONTEXT_LINES),
+                min(len(lines), i + _EXCERPT_CONTEXT_LINES + 1),
+            )
+        )
+        if matches
+        else range(len(lines))
+    )
+
+    keep = [False] * len(lines)
+    budget = max_tokens * CHARS_PER_TOKEN
+    used = 0
+    for j in candidates:
+        if keep[j]:
+            continue
+        used += len(lines[j]) + 1
+        if used > budget:
+            break
+        keep[j] = True
+
+    excerpt = ["[Excerpt: only lines relevant to the plan are shown, with line numbers]"]
+    omitted_from: Optional[int] = None
+    for n, line in enumerate(lines):
+        if keep[n]:
+            if omitted_from is not None:
+                excerpt.append(f"... (lines {omitted_from + 1}-{n} omitted) ...")
+                omitted_from = None
+            excerpt.append(f"{n + 1}: {line}")
+        elif omitted_from is None:
+            omitted_from = n
+    if omitted_from is not None:
+        excerpt.append(f"... (lines {omitted_from + 1}-{len(lines)} omitted) ...")
+    return "\n".join(excerpt)
+
+
+def _render_plan(plan: Any) -> str:
+    """Render the plan as the text used in the prompt and the response cache key.
+
+    Structured plans become JSON with `Complexity` given by its API string
+    (e.g. "low"), rather than a Python repr of the enum.
+    """
+    if isinstance(plan, str):
+        return plan
+    if isinstance(plan, dict):
+        plan = {
+            key: value.api_value if isinstance(value, Complexity) else value
+            for key, value in plan.items()
+        }
+    return json.dumps(plan, ensure_ascii=False, indent=2, default=str)
+
+
+def _plan_keywords(plan: Any) -> FrozenSet[str]:
+    """Collect the identifiers excerpts are centred on from the plan's content."""
+    if not isinstance(plan, dict):
+        return frozenset(_KEYWORD_RE.findall(str(plan)))
+    texts: List[str] = []
+    for field in _KEYWORD_PLAN_FIELDS:
+        value = plan.get(field)
+        if isinstance(value, (list, tuple)):
+            texts.extend(str(item) for item in value)
+        elif value is not None:
+            texts.append(str(value))
+    return frozenset(_KEYWORD_RE.findall("\n".join(texts)))
 
-async def execute_issue(state: GraphState) -> GraphState:
-    """Execute a planned change and attach a unified diff to the graph state.
+
+def _fit_to_budget(plan: Any, file_contents: Dict[str, str]) -> Dict[str, str]:
+    """Excerpt any file whose estimated size exceeds its share of the token budget."""
+    per_file_budget = get_settings().max_context_tokens // len(file_contents)
+    keywords = _plan_keywords(plan)
+
+    fitted: Dict[str, str] = {}
+    for file_path, content in file_contents.items():
+        tokens = estimate_tokens(content)
+        if tokens <= per_file_budget:
+            fitted[file_path] = content
+            continue
+        excerpt = _excerpt_file(content, keywords, per_file_budget)
+        logger.info(
+            "execute_issue.file_excerpted",
+            file_path=file_path,
+            tokens_before=tokens,
+            tokens_after=estimate_tokens(excerpt),
+        )
+        fitted[file_path] = excerpt
+    return fitted
+
+
+def _response_cache_key(plan_text: str, file_contents: Dict[str, str]) -> str:
+    """Build a content-addressed key from the rendered plan and each file's digest."""
+    hasher = hashlib.blake2b(plan_text.encode("utf-8"), digest_size=16)
+    for file_path, content in sorted(file_contents.items()):
+        file_digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+        hasher.update(f"|{file_path}:{file_digest}".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+async def execute_issue(state: GraphState) -> Dict[str, Any]:
+    """Execute a planned change and produce a unified diff.
 
     Args:
-        state: Mutable graph state dictionary. Expected keys include:
-            - "plan": A description of the intended changes (currently unused).
+        state: Current graph state. Expected keys include:
+            - "plan": A description of the intended changes.
             - "target_files": A list of repository-relative file paths to modify.
 
     Returns:
-        The updated graph state.
+        A partial state update for the graph runner to merge.
 
         On success:
-            - state["diff"] is a unified diff string describing the changes
-            - state["status"] == "executed"
+            - "diff" is a unified diff string describing the changes
+            - "status" == "executed"
 
-        On error (missing/empty target_files):
-            - state["status"] == "error"
-            - state["error"] contains a human-readable error message
+        On error (missing/empty target_files, unreadable files, LLM failure):
+            - "status" == "error"
+            - "error" contains a human-readable error message
     """
 
     plan = state.get("plan")
     target_files = state.get("target_files")
 
     if not target_files:
-        error_state = GraphState(**state)
-        error_state["status"] = "error"
-        error_state["error"] = "No target_files specified; unable to execute issue."
-        return error_state
+        return {
+            "status": "error",
+            "error": "No target_files specified; unable to execute issue.",
+        }
 
-    # Read the content of the target files
-    file_contents = {}
-    for file_path in target_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_contents[file_path] = f.read()
-        except FileNotFoundError:
-            error_state = GraphState(**state)
-            error_state["status"] = "error"
-            error_state["error"] = f"File not found: {file_path}"
-            return error_state
-        except Exception as e:
-            error_state = GraphState(**state)
-            error_state["status"] = "error"
-            error_state["error"] = f"Error reading file {file_path}: {e}"
-            return error_state
-
-    settings = get_settings()
-    llm = ChatAnthropic(api_key=settings.anthropic_api_key, model="claude-3-5-sonnet-20240620")
-
-    system_prompt = (
-        "You are an expert software engineer. Your task is to generate a unified diff "
-        "to apply the planned changes to the codebase. "
-        "You will be provided with the plan and the content of the target files. "
-        "Output ONLY the unified diff. Do not include any explanations or markdown formatting."
+    # Read the content of the target files concurrently
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_read_file, file_path) for file_path in target_files),
+        return_exceptions=True,
     )
 
-    user_content = f"Plan:\n{plan}\n\n"
-    for file_path, content in file_contents.items():
-        user_content += f"File: {file_path}\nContent:\n{content}\n\n"
+    file_contents = {}
+    for file_path, result in zip(target_files, results):
+        if isinstance(result, FileNotFoundError):
+            return {"status": "error", "error": f"File not found: {file_path}"}
+        if isinstance(result, BaseException):
+            return {
+                "status": "error",
+                "error": f"Error reading file {file_path}: {result}",
+            }
+        file_contents[file_path] = result
+
+    plan_text = _render_plan(plan)
+    cache_key = _response_cache_key(plan_text, file_contents)
+    cached_diff = _RESPONSE_CACHE.get(cache_key)
+    if cached_diff is not None:
+        _RESPONSE_CACHE.move_to_end(cache_key)
+        return {"status": "executed", "diff": cached_diff}
+
+    file_contents = _fit_to_budget(plan, file_contents)
+
+    # Stable, large blocks go first so Anthropic can serve them from its prompt
+    # cache. A cache breakpoint covers the whole prefix before it, so marking the
+    # last file block caches every file (the API allows at most 4 breakpoints).
+    user_blocks: List[Dict[str, Any]] = [
+        {"type": "text", "text": f"File: {file_path}\nContent:\n{content}\n"}
+        for file_path, content in file_contents.items()
+    ]
+    user_blocks[-1]["cache_control"] = _EPHEMERAL_CACHE
+    user_blocks.append({"type": "text", "text": f"Plan:\n{plan_text}\n"})
 
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_content),
+    messages: List[Message] = [
+        _SYSTEM_MESSAGE,
+        {"role": "user", "content": user_blocks},
     ]
 
     try:
-        response = await llm.ainvoke(messages)
-        unified_diff = response.content
-        if isinstance(unified_diff, list):
-            # Handle case where content might be list of blocks
-            unified_diff = "\n".join(
-                [block.text for block in unified_diff if hasattr(block, "text")]
-            )
+        unified_diff = await _submit(messages)
 
         # Strip markdown code blocks if present
-        if unified_diff.startswith("```diff"):
-            unified_diff = unified_diff[7:]
-        elif unified_diff.startswith("```"):
-            unified_diff = unified_diff[3:]
+        fenced = _FENCE_RE.match(unified_diff)
+        unified_diff = (fenced.group(1) if fenced else unified_diff).strip()
 
-        if unified_diff.endswith("```"):
-            unified_diff = unified_diff[:-3]
+    except Exception as e:
+        return {"status": "error", "error": f"Error generating patch: {e}"}
 
-        unified_diff = unified_diff.strip()
+    _RESPONSE_CACHE[cache_key] = unified_diff
+    if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX_ENTRIES:
+        _RESPONSE_CACHE.popitem(last=False)
 
-    except Exception as e:
-        error_state = GraphState(**state)
-        error_state["status"] = "error"
-        error_state["error"] = f"Error generating patch: {e}"
-        return error_state
-
-    success_state = GraphState(**state)
-    success_state["diff"] = unified_diff
-    success_state["status"] = "executed"
-    return success_state
+    return {"status": "executed", "diff": unified_diff}
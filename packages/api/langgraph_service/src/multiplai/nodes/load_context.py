@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+from typing import Any, Dict
+
+from multiplai.repo_tree import get_repository_context
 from multiplai.types import GraphState
 
 
-async def load_context(state: GraphState) -> GraphState:
+def _status_update(state: GraphState, status: str) -> Dict[str, Any]:
+    """Build a partial state update that sets `status` and clears any previous error."""
+
+    update: Dict[str, Any] = {"status": status}
+    if "error" in state:
+        update["error"] = None
+    return update
+
+
+async def load_context(state: GraphState) -> Dict[str, Any]:
     """Load/prepare contextual information required to process an issue.
 
     This node is expected to:
@@ -11,39 +24,16 @@ async def load_context(state: GraphState) -> GraphState:
     - Fetch/prepare repository context and target file contents
     - Populate `target_files` and `file_contents` in the shared graph state
 
-    For now this implementation is a placeholder that only marks the state as
+    For now it only scans the repository tree, stored as `context["file_tree"]`
+    so `plan_issue` does not walk the file system again, and marks the state as
     having completed context loading.
     """
 
-    updated_state = GraphState(**state)
-    updated_state["status"] = "context_loaded"
-    # Clear any previous error when successfully loading context.
-    updated_state.pop("error", None)  # type: ignore[misc]
-    return updated_state
-
-
-async def plan_issue_placeholder(state: GraphState) -> GraphState:
-    """Placeholder node that would generate an implementation plan."""
+    context = dict(state.get("context") or {})
+    # Scan in a worker thread so the event loop keeps serving other graph runs.
+    context["file_tree"] = await asyncio.to_thread(get_repository_context, ".")
 
-    updated_state = GraphState(**state)
-    updated_state["status"] = "planned"
-    updated_state.pop("error", None)  # type: ignore[misc]
-    return updated_state
-
-
-async def execute_issue_placeholder(state: GraphState) -> GraphState:
-    """Placeholder node that would execute the implementation plan and produce a diff."""
-
-    updated_state = GraphState(**state)
-    updated_state["status"] = "executed"
-    updated_state.pop("error", None)  # type: ignore[misc]
-    return updated_state
-
-
-async def create_pr_placeholder(state: GraphState) -> GraphState:
-    """Placeholder node that would open a pull request from the produced diff."""
-
-    updated_state = GraphState(**state)
-    updated_state["status"] = "pr_created"
-    updated_state.pop("error", None)  # type: ignore[misc]
-    return updated_state
+    # Clear any previous error when successfully loading context.
+    update = _status_update(state, "context_loaded")
+    update["context"] = context
+    return update
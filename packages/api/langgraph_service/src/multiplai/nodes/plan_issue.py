@@ -6,10 +6,11 @@ implementation plan from the current graph state.
 
 from __future__ import annotations
 
-import os
-from typing import Any, List, Literal
+import asyncio
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Tuple, Union, cast
 
-from langchain_anthropic import ChatAnthropic  # type: ignore[import-not-found]
 from langchain_core.messages import (  # type: ignore[import-not-found]
     HumanMessage,
     SystemMessage,
@@ -17,8 +18,45 @@ from langchain_core.messages import (  # type: ignore[import-not-found]
 from pydantic import BaseModel, Field  # type: ignore[import-not-found]
 
 from multiplai.config import get_settings
+from multiplai.llm import (
+    ANTHROPIC_MODEL,
+    CHARS_PER_TOKEN,
+    estimate_tokens,
+    get_async_anthropic,
+    get_rate_limiter,
+    get_tool_llm,
+)
+from multiplai.repo_tree import get_repository_context
+from multiplai.schemas import Complexity
 from multiplai.types import GraphState, Plan
 
+if TYPE_CHECKING:
+    from anthropic.types.messages.batch_create_params import (  # type: ignore[import-not-found]
+        Request,
+    )
+
+_SYSTEM_PROMPT = (
+    "You are an expert software engineer and architect. "
+    "Your goal is to analyze the provided GitHub issue and create a detailed "
+    "implementation plan.\n"
+    "The plan must include:\n"
+    "1. Definition of Done: clear criteria to verify the task.\n"
+    "2. Steps: step-by-step implementation guide.\n"
+    "3. Target Files: list of files that likely need to be modified or created.\n"
+    "4. Estimated Complexity: low, medium, or high.\n\n"
+    "Be specific and technical. "
+    "Use the provided repository file structure to identify correct file paths."
+)
+# The system prompt and repository tree form a stable prefix across planning
+# calls, so both end in an Anthropic prompt-cache breakpoint.
+_EPHEMERAL_CACHE: Dict[str, str] = {"type": "ephemeral"}
+# Typed as langchain message content, which also allows bare strings.
+ContentBlocks = List[Union[str, Dict[str, Any]]]
+_SYSTEM_BLOCKS: ContentBlocks = [
+    {"type": "text", "text": _SYSTEM_PROMPT, "cache_control": _EPHEMERAL_CACHE}
+]
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_BLOCKS)
+
 
 class PlanModel(BaseModel):
     """Pydantic model for structured plan generation."""
@@ -35,136 +73,301 @@ class PlanModel(BaseModel):
     )
 
 
-def _get_repository_context(root_dir: str = ".") -> str:
-    """Generate a simple tree view of the repository files."""
-    tree: List[str] = []
-    # Limit depth or excluded dirs could be improved
-    exclude_dirs = {
-        "__pycache__",
-        ".git",
-        ".github",
-        "node_modules",
-        "dist",
-        "build",
-        ".venv",
-        "venv",
-    }
-
-    # Try to list mostly src/ files to fit in context window
-    # If root_dir is ".", we walk everything.
-
-    count = 0
-    max_files = 500  # Safety limit
-
-    for root, dirs, files in os.walk(root_dir):
-        # Modify dirs in-place to skip excluded
-        dirs[:] = [d for d in dirs if d not in exclude_dirs and not d.startswith(".")]
-
-        level = root.replace(root_dir, "").count(os.sep)
-        indent = "  " * level
-        tree.append(f"{indent}{os.path.basename(root)}/")
-
-        for f in files:
-            if (
-                f.endswith(".py")
-                or f.endswith(".md")
-                or f.endswith(".ts")
-                or f.endswith(".json")
-            ):
-                tree.append(f"{indent}  {f}")
-                count += 1
-
-        if count > max_files:
-            tree.append(f"{indent}  ... (truncated)")
+_PLAN_FIELDS = frozenset(PlanModel.model_fields)
+
+# Message Batches API settings for `plan_issues_batch`. The max_tokens value
+# matches ChatAnthropic's default used by `plan_issue`.
+_BATCH_POLL_INTERVAL_SECONDS = 20.0
+_PLAN_MAX_TOKENS = 4096
+
+# Issue fields read from `state["issue"]`, and the flat state keys (with
+# defaults) used when the issue does not provide them.
+_ISSUE_FIELDS = ("title", "body", "number")
+_ISSUE_FALLBACKS: Dict[str, Tuple[str, str]] = {
+    "title": ("issue_title", "Unknown Title"),
+    "body": ("issue_body", "No description provided."),
+    "number": ("issue_number", "Unknown"),
+}
+
+# Files dropped from a clipped repository tree are listed after the cache
+# breakpoint, with the issue, when their paths share words with it.
+_MAX_RELEVANT_OMITTED_FILES = 20
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _fit_repository_context(tree: str, max_tokens: int) -> Tuple[str, List[str]]:
+    """Clip the rendered tree to `max_tokens`, keeping files under a `src/` directory first.
+
+    The clip does not depend on the issue, so the repository context block
+    stays byte-identical (and prompt-cacheable) across planning calls. Kept
+    files retain their directory lines and original order, so the result is
+    still a valid tree.
+
+    Returns:
+        The clipped tree, and the paths (relative to the root) of the files it
+        dropped.
+    """
+    if estimate_tokens(tree) <= max_tokens:
+        return tree, []
+
+    lines = tree.split("\n")
+    ancestors: List[int] = []
+    files: List[Tuple[int, bool, Tuple[int, ...]]] = []
+    for index, line in enumerate(lines):
+        name = line.lstrip(" ")
+        depth = (len(line) - len(name)) // 2
+        if name.endswith("/"):
+            del ancestors[depth:]
+            ancestors.append(index)
+        elif not name.startswith("... ("):
+            parents = tuple(ancestors[:depth])
+            in_src = any(lines[parent].strip() == "src/" for parent in parents)
+            files.append((index, in_src, parents))
+
+    # Stable, so files keep their tree order within each group.
+    files.sort(key=lambda file: not file[1])
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    keep = set()
+    dropped: List[str] = []
+    for position, (index, _, parents) in enumerate(files):
+        new_lines = [i for i in (*parents, index) if i not in keep]
+        cost = sum(len(lines[i]) + 1 for i in new_lines)
+        if cost > budget:
+            # parents[0] is the root directory, which paths are relative to.
+            dropped = [
+                "".join(lines[i].strip() for i in (*file_parents[1:], file_index))
+                for file_index, _, file_parents in files[position:]
+            ]
             break
+        budget -= cost
+        keep.update(new_lines)
+
+    clipped = [line for index, line in enumerate(lines) if index in keep]
+    clipped.append("... (truncated to fit the context budget)")
+    return "\n".join(clipped), dropped
 
-    return "\n".join(tree)
 
+def _relevant_files(paths: List[str], issue_text: str) -> List[str]:
+    """Pick the paths sharing the most words with the issue text, best first."""
+    issue_words = frozenset(_WORD_RE.findall(issue_text.lower()))
+    scored = [
+        (len(issue_words.intersection(_WORD_RE.findall(path.lower()))), path) for path in paths
+    ]
+    scored.sort(key=lambda item: -item[0])
+    return [path for score, path in scored[:_MAX_RELEVANT_OMITTED_FILES] if score]
+
+
+async def _load_file_tree(state: GraphState) -> str:
+    """Get the repository tree, preferring the one load_context stored in the state.
+
+    A fresh scan runs in a worker thread so it does not block the event loop.
+    The current directory is assumed to be the package root or similar.
+    """
+    context = state.get("context") or {}
+    file_tree = context.get("file_tree")
+    if file_tree:
+        return str(file_tree)
+    return await asyncio.to_thread(get_repository_context, ".")
+
+
+def _normalize_issue(issue_data: Any) -> Dict[str, str]:
+    """Read the title, body and number of an issue given as an object or a dict.
+
+    Fields the issue lacks are returned as empty strings. Anything that is
+    neither a dict nor an object with a `title` yields an empty mapping.
+    """
+    if isinstance(issue_data, dict):
+        return {key: str(issue_data.get(key, "")) for key in _ISSUE_FIELDS}
+    if hasattr(issue_data, "title"):
+        return {key: str(getattr(issue_data, key, "")) for key in _ISSUE_FIELDS}
+    return {}
+
+
+def _extract_issue(state: GraphState) -> Tuple[str, str, str]:
+    """Return the issue's (title, body, number), falling back to flat state keys."""
+    issue = _normalize_issue(state["issue"]) if "issue" in state else {}
+    title, body, number = (
+        issue.get(key) or str(state.get(state_key, default))
+        for key, (state_key, default) in _ISSUE_FALLBACKS.items()
+    )
+    return title, body, number
+
+
+def _build_user_content(state: GraphState, file_tree: str) -> ContentBlocks:
+    """Render the repository context and issue into the planning prompt's content blocks.
+
+    The repository context comes first and carries a cache breakpoint; the
+    issue, which changes on every call, follows in an uncached block. When the
+    tree had to be clipped, that block also lists dropped files whose paths
+    match the issue.
+    """
+    title, body, number = _extract_issue(state)
+    file_context, dropped = _fit_repository_context(
+        file_tree, get_settings().max_repository_context_tokens
+    )
 
-async def plan_issue(state: GraphState) -> GraphState:
+    issue_text = f"Issue #{number}: {title}\n\nDescription:\n{body}"
+    relevant = _relevant_files(dropped, f"{title}\n{body}")
+    if relevant:
+        listing = "\n".join(f"- {path}" for path in relevant)
+        issue_text += f"\n\nRelevant files not shown in the repository context:\n{listing}"
+
+    return [
+        {
+            "type": "text",
+            "text": f"Repository Context:\n{file_context}",
+            "cache_control": _EPHEMERAL_CACHE,
+        },
+        {"type": "text", "text": issue_text},
+    ]
+
+
+def _plan_from_tool_args(args: Dict[str, Any]) -> Plan:
+    """Turn the arguments of a PlanModel tool call into a plan.
+
+    Anthropic does not enforce tool input schemas, so arguments are validated
+    against PlanModel unless `strict_validation` is disabled, in which case
+    they are only required to provide every PlanModel field. The tool emits
+    the complexity as a string, which is mapped to `Complexity` here.
+    """
+    if get_settings().strict_validation:
+        plan = PlanModel.model_validate(args).model_dump()
+    else:
+        missing = _PLAN_FIELDS.difference(args)
+        if missing:
+            raise ValueError(f"Plan is missing fields: {', '.join(sorted(missing))}")
+        plan = dict(PlanModel.model_construct(**args))
+    plan["estimated_complexity"] = Complexity.parse(plan["estimated_complexity"])
+    return plan  # type: ignore[return-value]
+
+
+async def plan_issue(state: GraphState) -> Dict[str, Any]:
     """Generate an implementation plan for the current issue.
 
     Args:
         state: Current graph state.
 
     Returns:
-        Updated graph state with:
+        A partial state update with:
         - status set to 'planned'
         - plan containing: definition_of_done, steps, target_files,
           estimated_complexity
     """
-    settings = get_settings()
-    llm = ChatAnthropic(
-        api_key=settings.anthropic_api_key, model="claude-3-5-sonnet-20240620"
-    )
-    structured_llm = llm.with_structured_output(PlanModel)
-
-    # Extract issue details robustly
-    issue_data: Any = state.get("issue")
-    title: str = ""
-    body: str = ""
-    number: str = ""
-
-    if issue_data:
-        # Check if it's an object with attributes
-        if hasattr(issue_data, "title"):
-            title = str(issue_data.title)
-            body = str(getattr(issue_data, "body", ""))
-            number = str(getattr(issue_data, "number", ""))
-        # Check if it's a dict
-        elif isinstance(issue_data, dict):
-            title = str(issue_data.get("title", ""))
-            body = str(issue_data.get("body", ""))
-            number = str(issue_data.get("number", ""))
-
-    # Fallback to flat state properties if issue object didn't provide data
-    if not title:
-        title = str(state.get("issue_title", "Unknown Title"))
-    if not body:
-        body = str(state.get("issue_body", "No description provided."))
-    if not number:
-        number = str(state.get("issue_number", "Unknown"))
-
-    # Generate file context
-    # Assume we are in the package root or similar.
-    # We'll list files from current directory.
-    file_context = _get_repository_context(".")
-
-    system_prompt = (
-        "You are an expert software engineer and architect. "
-        "Your goal is to analyze the provided GitHub issue and create a detailed "
-        "implementation plan.\n"
-        "The plan must include:\n"
-        "1. Definition of Done: clear criteria to verify the task.\n"
-        "2. Steps: step-by-step implementation guide.\n"
-        "3. Target Files: list of files that likely need to be modified or created.\n"
-        "4. Estimated Complexity: low, medium, or high.\n\n"
-        "Be specific and technical. "
-        "Use the provided repository file structure to identify correct file paths."
-    )
+    plan_llm = get_tool_llm(PlanModel)
+
+    user_content = _build_user_content(state, await _load_file_tree(state))
+    messages = [
+        _SYSTEM_MESSAGE,
+        HumanMessage(content=user_content),
+    ]
+
+    try:
+        # Throttle before sending rather than backing off after a 429.
+        await get_rate_limiter().acquire(
+            estimate_tokens(
+                _SYSTEM_PROMPT,
+                *(block["text"] for block in user_content if isinstance(block, dict)),
+            )
+        )
+        result = await plan_llm.ainvoke(messages)
+        # tool_choice forces exactly one PlanModel call, so there is no text to parse.
+        if not result.tool_calls:
+            return {"status": "error", "error": "Failed to generate plan: no plan in response"}
+        plan = _plan_from_tool_args(result.tool_calls[0]["args"])
+    except Exception as e:
+        return {"status": "error", "error": f"Failed to generate plan: {str(e)}"}
+
+    return {"status": "planned", "plan": plan}
 
-    user_message = (
-        f"Issue #{number}: {title}\n\n"
-        f"Description:\n{body}\n\n"
-        f"Repository Context:\n{file_context}"
+
+@lru_cache(maxsize=1)
+def _get_plan_tool() -> Dict[str, Any]:
+    """Build the Anthropic tool definition for PlanModel once per process."""
+    from langchain_anthropic.chat_models import (  # type: ignore[import-not-found]
+        convert_to_anthropic_tool,
     )
 
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_message),
+    return dict(convert_to_anthropic_tool(PlanModel))
+
+
+def _batch_result_update(result: Any) -> Dict[str, Any]:
+    """Convert one Message Batches result into a plan_issue-style state update."""
+    if result.type != "succeeded":
+        detail = getattr(result, "error", None) or result.type
+        return {"status": "error", "error": f"Failed to generate plan: {detail}"}
+
+    for block in result.message.content:
+        if block.type == "tool_use" and block.name == PlanModel.__name__:
+            try:
+                plan = _plan_from_tool_args(block.input)
+            except Exception as e:
+                return {"status": "error", "error": f"Failed to generate plan: {str(e)}"}
+            return {"status": "planned", "plan": plan}
+
+    return {"status": "error", "error": "Failed to generate plan: no plan in batch response"}
+
+
+async def plan_issues_batch(
+    states: List[GraphState],
+    poll_interval_seconds: float = _BATCH_POLL_INTERVAL_SECONDS,
+) -> List[Dict[str, Any]]:
+    """Generate implementation plans for several issues via Anthropic's Message Batches API.
+
+    Batched requests cost half as much as regular calls but may take minutes to
+    complete, so this suits non-urgent planning of many issues (e.g. every task
+    in a job). The batch is polled until processing has ended.
+
+    Args:
+        states: Graph states of the issues to plan.
+        poll_interval_seconds: Delay between batch status checks.
+
+    Returns:
+        One partial state update per input state, in the same order, shaped
+        like `plan_issue`'s result.
+    """
+    if not states:
+        return []
+
+    # Force the plan tool call, as plan_issue does.
+    plan_tool = _get_plan_tool()
+    # Sequential so only the first missing tree is scanned; the rest hit the cache.
+    file_trees = [await _load_file_tree(state) for state in states]
+    # The prompt blocks are typed for langchain; they are valid Anthropic params as is.
+    requests: List[Request] = [
+        cast(
+            "Request",
+            {
+                "custom_id": f"plan-{index}",
+                "params": {
+                    "model": ANTHROPIC_MODEL,
+                    "max_tokens": _PLAN_MAX_TOKENS,
+                    "system": _SYSTEM_BLOCKS,
+                    "messages": [
+                        {"role": "user", "content": _build_user_content(state, file_tree)}
+                    ],
+                    "tools": [plan_tool],
+                    "tool_choice": {"type": "tool", "name": plan_tool["name"]},
+                },
+            },
+        )
+        for index, (state, file_tree) in enumerate(zip(states, file_trees))
     ]
 
+    client = get_async_anthropic()
+    updates: Dict[str, Dict[str, Any]] = {}
     try:
-        result = await structured_llm.ainvoke(messages)
-        # result is an instance of PlanModel
-        plan: Plan = result.model_dump()  # type: ignore[assignment]
+        batch = await client.messages.batches.create(requests=requests)
+        while batch.processing_status != "ended":
+            await asyncio.sleep(poll_interval_seconds)
+            batch = await client.messages.batches.retrieve(batch.id)
+
+        async for entry in await client.messages.batches.results(batch.id):
+            updates[entry.custom_id] = _batch_result_update(entry.result)
     except Exception as e:
-        error_state = GraphState(**state)
-        error_state["status"] = "error"
-        error_state["error"] = f"Failed to generate plan: {str(e)}"
-        return error_state
-
-    success_state = GraphState(**state)
-    success_state["status"] = "planned"
-    success_state["plan"] = plan
-    return success_state
+        return [
+            {"status": "error", "error": f"Failed to generate plan: {str(e)}"} for _ in states
+        ]
+
+    missing = {"status": "error", "error": "Failed to generate plan: missing batch result"}
+    return [dict(updates.get(f"plan-{index}", missing)) for index in range(len(states))]
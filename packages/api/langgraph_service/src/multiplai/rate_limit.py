@@ -0,0 +1,57 @@
+"""Client-side rate limiting for Anthropic API calls.
+
+Throttling before a request is sent keeps concurrent callers under the account's
+requests-per-minute and tokens-per-minute ceilings, instead of discovering them
+through 429 responses and retry back-off.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """Token-bucket limiter for requests and (estimated) input tokens per minute.
+
+    Both buckets start full and refill continuously. A call waits until one
+    request slot and enough token capacity are available. Requests larger than
+    the whole per-minute token budget are admitted once the bucket is full, so
+    they are never blocked forever.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Rate limits must be positive")
+        self._request_capacity = float(requests_per_minute)
+        self._token_capacity = float(tokens_per_minute)
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60.0
+        self._updated_at = now
+        self._requests = min(
+            self._request_capacity,
+            self._requests + elapsed_minutes * self._request_capacity,
+        )
+        self._tokens = min(
+            self._token_capacity,
+            self._tokens + elapsed_minutes * self._token_capacity,
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a request costing `tokens` input tokens may be sent."""
+        needed_tokens = min(float(tokens), self._token_capacity)
+        while True:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= needed_tokens:
+                self._requests -= 1
+                self._tokens -= needed_tokens
+                return
+
+            request_wait = (1 - self._requests) / self._request_capacity * 60.0
+            token_wait = (needed_tokens - self._tokens) / self._token_capacity * 60.0
+            await asyncio.sleep(max(request_wait, token_wait, 0.0))
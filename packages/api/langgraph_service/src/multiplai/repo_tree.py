@@ -0,0 +1,155 @@
+"""Repository tree rendering for MultiplAI nodes.
+
+`load_context` and `plan_issue` both describe the repository to the LLM as an
+indented tree of its source files. Rendering walks the file system, so results
+are cached per repository until its top-level layout changes or a short TTL
+expires.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from functools import lru_cache
+from typing import List, Tuple
+
+# Directories never included in the repository tree.
+_EXCLUDE_DIRS = frozenset(
+    {
+        "__pycache__",
+        ".git",
+        ".github",
+        "node_modules",
+        "dist",
+        "build",
+        ".venv",
+        "venv",
+        "target",
+        ".next",
+        ".turbo",
+        ".pytest_cache",
+        ".mypy_cache",
+        "coverage",
+        "htmlcov",
+        ".tox",
+        ".cache",
+    }
+)
+
+# Maximum number of files listed in the repository tree.
+_MAX_TREE_FILES = 500
+
+# Directories with more entries than this are almost certainly generated or
+# vendored, so they are not listed or descended into.
+_MAX_DIR_ENTRIES = 10_000
+
+# File extensions included in the repository tree.
+_ALLOWED_EXTENSIONS = frozenset({"py", "md", "ts", "json"})
+
+# Cached trees are keyed on top-level directory mtimes, which miss changes deep
+# in the tree, so entries also expire after this many seconds.
+_TREE_CACHE_TTL_SECONDS = 60.0
+
+
+def _scan_repository_tree(root_dir: str) -> str:
+    """Walk `root_dir` and render a simple tree view of the repository files.
+
+    Uses an explicit DFS over `os.scandir` so directory/file classification
+    comes from the cached dirent type instead of an extra `stat` per entry.
+    """
+    tree: List[str] = []
+    # Local aliases skip an attribute/global lookup per entry in the hot loops.
+    append = tree.append
+    exclude_dirs = _EXCLUDE_DIRS
+    allowed_extensions = _ALLOWED_EXTENSIONS
+
+    # Try to list mostly src/ files to fit in context window
+    # If root_dir is ".", we walk everything.
+
+    count = 0
+
+    stack: List[Tuple[str, str, int]] = [(root_dir, os.path.basename(root_dir), 0)]
+    while stack:
+        path, name, level = stack.pop()
+        subdirs: List[Tuple[str, str, int]] = []
+        files: List[str] = []
+        oversized = False
+        truncated = False
+        try:
+            with os.scandir(path) as entries:
+                for entry_count, entry in enumerate(entries, 1):
+                    if entry_count > _MAX_DIR_ENTRIES:
+                        oversized = True
+                        break
+                    if entry.is_dir(follow_symlinks=False):
+                        # Skip excluded and hidden directories
+                        if entry.name not in exclude_dirs and not entry.name.startswith("."):
+                            subdirs.append((entry.path, entry.name, level + 1))
+                    else:
+                        _, dot, extension = entry.name.rpartition(".")
+                        if not dot or extension not in allowed_extensions:
+                            continue
+                        files.append(entry.name)
+                        # Stop scanning the moment the cap is exceeded.
+                        if count + len(files) > _MAX_TREE_FILES:
+                            truncated = True
+                            break
+        except OSError:
+            # Unreadable directories are skipped, as os.walk does.
+            continue
+
+        indent = "  " * level
+        append(f"{indent}{name}/")
+        if oversized:
+            append(f"{indent}  ... (skipped: more than {_MAX_DIR_ENTRIES} entries)")
+            continue
+
+        for f in files:
+            append(f"{indent}  {f}")
+        count += len(files)
+
+        if truncated:
+            append(f"{indent}  ... (truncated)")
+            break
+
+        # Push in reverse so subdirectories are visited in listing order.
+        stack.extend(reversed(subdirs))
+
+    return "\n".join(tree)
+
+
+def _tree_signature(root_dir: str) -> Tuple[Tuple[str, int], ...]:
+    """Cheap fingerprint of `root_dir`: its mtime plus those of its top-level dirs."""
+    signature = [("", os.stat(root_dir).st_mtime_ns)]
+    with os.scandir(root_dir) as entries:
+        for entry in entries:
+            if (
+                entry.is_dir(follow_symlinks=False)
+                and entry.name not in _EXCLUDE_DIRS
+                and not entry.name.startswith(".")
+            ):
+                signature.append((entry.name, entry.stat(follow_symlinks=False).st_mtime_ns))
+    return tuple(sorted(signature))
+
+
+@lru_cache(maxsize=16)
+def _build_tree_cached(
+    root_dir: str, signature: Tuple[Tuple[str, int], ...], ttl_bucket: int
+) -> str:
+    """Memoize the rendered tree; `signature` and `ttl_bucket` only key the cache."""
+    return _scan_repository_tree(root_dir)
+
+
+def get_repository_context(root_dir: str = ".") -> str:
+    """Generate a simple tree view of the repository files.
+
+    Repeated calls for an unchanged repository are served from a cache instead
+    of walking the file system again. If the repository cannot be fingerprinted
+    (e.g. it is missing or changes mid-check), it is scanned without caching.
+    """
+    try:
+        signature = _tree_signature(root_dir)
+    except OSError:
+        return _scan_repository_tree(root_dir)
+    ttl_bucket = int(time.monotonic() // _TREE_CACHE_TTL_SECONDS)
+    return _build_tree_cached(root_dir, signature, ttl_bucket)
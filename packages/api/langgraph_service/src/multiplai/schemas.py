@@ -1,44 +1,130 @@
-"""Data models and schemas for MultiplAI system."""
+"""Data models and schemas for MultiplAI system.
 
-from datetime import datetime
-from enum import Enum
-from typing import Optional
-
-from pydantic import BaseModel  # type: ignore[import-not-found]
-
-
-class TaskStatus(str, Enum):
-    """Status values for task execution lifecycle."""
-
-    NEW = "NEW"
-    PLANNING = "PLANNING"
-    PLANNING_DONE = "PLANNING_DONE"
-    CODING = "CODING"
-    CODING_DONE = "CODING_DONE"
-    TESTING = "TESTING"
-    TESTS_PASSED = "TESTS_PASSED"
-    TESTS_FAILED = "TESTS_FAILED"
-    FIXING = "FIXING"
-    REVIEWING = "REVIEWING"
-    REVIEW_APPROVED = "REVIEW_APPROVED"
-    PR_CREATED = "PR_CREATED"
-    WAITING_HUMAN = "WAITING_HUMAN"
-    COMPLETED = "COMPLETED"
-    FAILED = "FAILED"
-    CANCELLED = "CANCELLED"
-
-
-class JobStatus(str, Enum):
-    """Status values for job execution."""
+Records are slotted dataclasses rather than Pydantic models, so building one
+in bulk costs no per-instance validation. In exchange, fields are neither
+validated nor converted: callers must pass typed values (e.g. `datetime`
+objects rather than ISO strings, ints rather than numeric strings). The only
+exception is enum fields, which also accept their API strings.
 
-    PENDING = "pending"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    CANCELLED = "cancelled"
+Serialize records with `to_api_dict`. Encoding a record directly (e.g. with
+`dataclasses.asdict`) emits statuses as ints, not their API strings.
+"""
 
+from __future__ import annotations
 
-class Task(BaseModel):
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntEnum
+from typing import Any, Dict, Optional
+
+
+class TaskStatus(IntEnum):
+    """Status values for task execution lifecycle.
+
+    Statuses are ints in memory so transitions compare cheaply; the API
+    exchanges them as their names. `TaskStatus("NEW")` and `from_api` parse
+    that form. Emit it with `api_value` or `to_api_dict`: JSON encoders write
+    IntEnums as plain ints and cannot be hooked to do otherwise.
+    """
+
+    NEW = 0
+    PLANNING = 1
+    PLANNING_DONE = 2
+    CODING = 3
+    CODING_DONE = 4
+    TESTING = 5
+    TESTS_PASSED = 6
+    TESTS_FAILED = 7
+    FIXING = 8
+    REVIEWING = 9
+    REVIEW_APPROVED = 10
+    PR_CREATED = 11
+    WAITING_HUMAN = 12
+    COMPLETED = 13
+    FAILED = 14
+    CANCELLED = 15
+
+    @property
+    def api_value(self) -> str:
+        """String form used by the API, e.g. "PLANNING_DONE"."""
+        return self.name
+
+    @classmethod
+    def from_api(cls, value: str) -> TaskStatus:
+        """Parse the API string form."""
+        try:
+            return cls[value]
+        except KeyError:
+            raise ValueError(f"Unknown task status: {value!r}") from None
+
+    @classmethod
+    def _missing_(cls, value: object) -> Optional[TaskStatus]:
+        # Keep TaskStatus("NEW") working as it did for the former str enum.
+        return cls.__members__.get(value) if isinstance(value, str) else None
+
+
+class JobStatus(IntEnum):
+    """Status values for job execution.
+
+    Ints in memory; the API exchanges them as lowercase names, parsed by
+    `JobStatus("running")` / `from_api` and emitted by `api_value` /
+    `to_api_dict` (not by JSON encoders, which write the int).
+    """
+
+    PENDING = 0
+    RUNNING = 1
+    COMPLETED = 2
+    FAILED = 3
+    CANCELLED = 4
+
+    @property
+    def api_value(self) -> str:
+        """String form used by the API, e.g. "running"."""
+        return _JOB_STATUS_NAMES[self]
+
+    @classmethod
+    def from_api(cls, value: str) -> JobStatus:
+        """Parse the API string form."""
+        if value not in _JOB_STATUS_NAMES:
+            raise ValueError(f"Unknown job status: {value!r}")
+        return cls(_JOB_STATUS_NAMES.index(value))
+
+    @classmethod
+    def _missing_(cls, value: object) -> Optional[JobStatus]:
+        # Keep JobStatus("running") working as it did for the former str enum.
+        if isinstance(value, str) and value in _JOB_STATUS_NAMES:
+            return cls(_JOB_STATUS_NAMES.index(value))
+        return None
+
+
+_JOB_STATUS_NAMES = tuple(status.name.lower() for status in JobStatus)
+
+
+class Complexity(IntEnum):
+    """Estimated implementation complexity, ordered so levels compare as ints."""
+
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+    @property
+    def api_value(self) -> str:
+        """String form used by the API and prompts, e.g. "medium"."""
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value: Complexity | int | str) -> Complexity:
+        """Convert a legacy "low"/"medium"/"high" string (or an int) to a Complexity."""
+        if isinstance(value, str):
+            try:
+                return cls[value.upper()]
+            except KeyError:
+                raise ValueError(f"Unknown complexity: {value!r}") from None
+        return cls(value)
+
+
+@dataclass(slots=True, kw_only=True)
+class Task:
     """Represents a single task in the system."""
 
     id: str
@@ -52,8 +138,14 @@ class Task(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+    def __post_init__(self) -> None:
+        # Accept the API string form, e.g. from a request body or database row.
+        if isinstance(self.status, str):
+            self.status = TaskStatus.from_api(self.status)
+
 
-class Job(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Job:
     """Represents a job containing multiple tasks."""
 
     id: str
@@ -64,10 +156,31 @@ class Job(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+    def __post_init__(self) -> None:
+        # Accept the API string form, e.g. from a request body or database row.
+        if isinstance(self.status, str):
+            self.status = JobStatus.from_api(self.status)
 
-class ExecutionPlan(BaseModel):
+
+@dataclass(slots=True, kw_only=True)
+class ExecutionPlan:
     """Represents a plan for executing a task."""
 
     steps: list[str]
     target_files: list[str]
-    estimated_complexity: str
+    estimated_complexity: Complexity
+
+    def __post_init__(self) -> None:
+        # Accept the legacy string form during migration.
+        self.estimated_complexity = Complexity.parse(self.estimated_complexity)
+
+
+def to_api_dict(record: Task | Job) -> Dict[str, Any]:
+    """Shallow-convert a record to its JSON API form, with `status` as a string.
+
+    This is the supported serialization boundary for records; encode the
+    returned dict rather than the record itself.
+    """
+    data = {name: getattr(record, name) for name in record.__slots__}
+    data["status"] = record.status.api_value
+    return data
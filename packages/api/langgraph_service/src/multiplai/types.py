@@ -2,14 +2,16 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Literal, TypedDict
+from typing import Any, Dict, List, Optional, TypedDict
+
+from multiplai.schemas import Complexity
 
 
 class Plan(TypedDict):
     definition_of_done: List[str]
     steps: List[str]
     target_files: List[str]
-    estimated_complexity: Literal["low", "medium", "high"]
+    estimated_complexity: Complexity
 
 
 class GraphState(TypedDict, total=False):
@@ -28,7 +30,8 @@ class GraphState(TypedDict, total=False):
 
     # Processing status
     status: str
-    error: str
+    # None once a node succeeds after an earlier error.
+    error: Optional[str]
 
     # Context and planning
     context: Dict[str, Any]
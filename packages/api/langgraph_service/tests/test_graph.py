@@ -1,6 +1,18 @@
+from dataclasses import dataclass
+from unittest.mock import MagicMock
+
 import pytest
 
-from multiplai.graph import GraphState, graph
+from multiplai.graph import (
+    END,
+    GraphState,
+    MemorySaver,
+    StateGraph,
+    graph,
+    load_context,
+    plan_issue,
+)
+from multiplai.schemas import Complexity
 
 
 @pytest.mark.asyncio
@@ -28,3 +40,94 @@ async def test_graph_happy_path() -> None:
     assert final_state["context"]["loaded"] is True
     assert "steps" in final_state["plan"]
     assert final_state["execution_result"]["ok"] is True
+
+    # Mutating one run's plan must not leak into later runs.
+    final_state["plan"]["steps"].append("mutated")
+    next_state = await graph.ainvoke({"status": "new", "trace": []})
+    assert next_state["plan"]["steps"] == ["execute", "create_pr"]
+
+
+@pytest.mark.asyncio
+async def test_graph_checkpoints_final_state_without_step_checkpoints() -> None:
+    workflow = StateGraph(GraphState)
+    workflow.add_node("load_context", load_context)
+    workflow.add_node("plan_issue", plan_issue)
+    workflow.set_entry_point("load_context")
+    workflow.add_edge("load_context", "plan_issue")
+    workflow.add_edge("plan_issue", END)
+
+    checkpointer = MemorySaver()
+    compiled = workflow.compile(checkpointer=checkpointer, checkpoint_each_step=False)
+    final_state = await compiled.ainvoke({"trace": []})
+
+    assert final_state["status"] == "planned"
+    assert checkpointer.get("default") == final_state
+
+
+class _AsyncCallableNode:
+    async def __call__(self, state: GraphState) -> dict:
+        return {"status": "called"}
+
+
+@pytest.mark.asyncio
+async def test_graph_awaits_sync_callables_returning_awaitables() -> None:
+    workflow = StateGraph(GraphState)
+    workflow.add_node("load_context", lambda state: load_context(state))
+    workflow.add_node("call", _AsyncCallableNode())
+    workflow.set_entry_point("load_context")
+    workflow.add_edge("load_context", "call")
+    workflow.add_edge("call", END)
+
+    final_state = await workflow.compile(checkpointer=MemorySaver()).ainvoke({"trace": []})
+
+    assert final_state["context"] == {"loaded": True}
+    assert final_state["status"] == "called"
+
+
+def test_graph_compile_rejects_cycles() -> None:
+    workflow = StateGraph(GraphState)
+    workflow.add_node("load_context", load_context)
+    workflow.add_node("plan_issue", plan_issue)
+    workflow.set_entry_point("load_context")
+    workflow.add_edge("load_context", "plan_issue")
+    workflow.add_edge("plan_issue", "load_context")
+
+    with pytest.raises(ValueError, match="Cycle detected"):
+        workflow.compile(checkpointer=MemorySaver())
+
+
+@dataclass
+class _Issue:
+    title: str
+
+
+def test_memory_saver_round_trips_state() -> None:
+    checkpointer = MemorySaver()
+    checkpointer.put("thread", {"status": "new", "issue": _Issue("Test Issue")})
+
+    assert checkpointer.get("thread") == {"status": "new", "issue": _Issue("Test Issue")}
+    assert checkpointer.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_graph_runs_with_unpicklable_issue() -> None:
+    class LocalIssue:
+        title = "Local"
+
+    for issue in (MagicMock(title="t"), LocalIssue(), lambda: None):
+        final_state = await graph.ainvoke({"issue": issue, "trace": []})
+
+        assert final_state["status"] == "pr_ready"
+        assert final_state["trace"][-1] == "create_pr"
+
+
+def test_memory_saver_keeps_enums_and_tuples_intact() -> None:
+    checkpointer = MemorySaver()
+    state = {"plan": {"estimated_complexity": Complexity.HIGH}, "files": ("a.py",)}
+    checkpointer.put("state", state)
+
+    restored = checkpointer.get("state")
+
+    assert restored == state
+    assert restored["plan"]["estimated_complexity"] is Complexity.HIGH
+    assert restored["files"] == ("a.py",)
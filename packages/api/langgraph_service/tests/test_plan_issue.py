@@ -1,28 +1,58 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from langchain_core.messages import AIMessage  # type: ignore[import-not-found]
 
-from multiplai.nodes.plan_issue import PlanModel, plan_issue
+from multiplai.llm import (
+    close_llm,
+    get_async_anthropic,
+    get_llm,
+    get_rate_limiter,
+    get_tool_llm,
+)
+from multiplai.nodes.plan_issue import (
+    PlanModel,
+    _extract_issue,
+    _fit_repository_context,
+    _normalize_issue,
+    plan_issue,
+    plan_issues_batch,
+)
+from multiplai.schemas import Complexity
 from multiplai.types import GraphState
 
 
 @pytest.fixture
 def mock_settings():
-    with patch("multiplai.nodes.plan_issue.get_settings") as mock:
+    with (
+        patch("multiplai.llm.get_settings") as mock,
+        patch("multiplai.nodes.plan_issue.get_settings", mock),
+    ):
         mock.return_value.anthropic_api_key = "dummy_key"
+        mock.return_value.anthropic_rpm = 1000
+        mock.return_value.anthropic_tpm = 1_000_000
+        mock.return_value.strict_validation = True
+        mock.return_value.max_repository_context_tokens = 8_000
+        get_rate_limiter.cache_clear()
         yield mock
+    get_rate_limiter.cache_clear()
 
 
 @pytest.fixture
 def mock_chat_anthropic():
-    with patch("multiplai.nodes.plan_issue.ChatAnthropic") as mock:
-        llm_instance = MagicMock()
-        mock.return_value = llm_instance
+    with patch("multiplai.nodes.plan_issue.get_tool_llm") as mock:
+        plan_llm = AsyncMock()
+        mock.return_value = plan_llm
 
-        structured_llm = AsyncMock()
-        llm_instance.with_structured_output.return_value = structured_llm
+        yield plan_llm
 
-        yield structured_llm
+
+def _plan_message(args):
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": "PlanModel", "args": args, "id": "toolu_1"}],
+    )
 
 
 @pytest.mark.asyncio
@@ -39,15 +69,24 @@ async def test_plan_issue_success(mock_settings, mock_chat_anthropic):
         estimated_complexity="low",
     )
 
-    # Mock the return value of ainvoke
-    mock_chat_anthropic.ainvoke.return_value = expected_plan
+    mock_chat_anthropic.ainvoke.return_value = _plan_message(expected_plan.model_dump())
 
     new_state = await plan_issue(state)
 
+    # Nodes return only their delta; the graph merges it into the state.
+    assert new_state.keys() == {"status", "plan"}
     assert new_state["status"] == "planned"
     assert new_state["plan"]["definition_of_done"] == ["Done"]
+    assert new_state["plan"]["estimated_complexity"] is Complexity.LOW
 
     mock_chat_anthropic.ainvoke.assert_called_once()
+    system_message, user_message = mock_chat_anthropic.ainvoke.call_args.args[0]
+    assert system_message.content[-1]["cache_control"] == {"type": "ephemeral"}
+    context_block, issue_block = user_message.content
+    assert context_block["text"].startswith("Repository Context:")
+    assert context_block["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in issue_block
+    assert issue_block["text"].startswith("Issue #1: Test Issue")
 
 
 @pytest.mark.asyncio
@@ -58,5 +97,200 @@ async def test_plan_issue_error(mock_settings, mock_chat_anthropic):
 
     new_state = await plan_issue(state)
 
+    assert new_state.keys() == {"status", "error"}
     assert new_state["status"] == "error"
     assert "API Error" in new_state["error"]
+
+
+@pytest.mark.asyncio
+async def test_plan_issue_rejects_response_without_tool_call(mock_settings, mock_chat_anthropic):
+    mock_chat_anthropic.ainvoke.return_value = AIMessage(content="Here is a plan...")
+
+    new_state = await plan_issue({"issue": {}, "status": "new"})
+
+    assert new_state == {"status": "error", "error": "Failed to generate plan: no plan in response"}
+
+
+@pytest.mark.asyncio
+async def test_plan_issue_rejects_invalid_tool_args(mock_settings, mock_chat_anthropic):
+    state: GraphState = {"issue": {}, "status": "new"}
+    mock_chat_anthropic.ainvoke.return_value = _plan_message({"steps": "one"})
+
+    new_state = await plan_issue(state)
+
+    assert new_state["status"] == "error"
+    assert "validation error" in new_state["error"]
+
+    # Without strict validation, arguments must still provide every field.
+    mock_settings.return_value.strict_validation = False
+    new_state = await plan_issue(state)
+
+    assert new_state["status"] == "error"
+    assert "missing fields: definition_of_done, estimated_complexity" in new_state["error"]
+
+
+@pytest.mark.asyncio
+async def test_tool_llm_is_reused_until_closed(mock_settings):
+    with patch("langchain_anthropic.ChatAnthropic") as mock_chat:
+        await close_llm()
+
+        assert get_tool_llm(PlanModel) is get_tool_llm(PlanModel)
+        mock_chat.return_value.bind_tools.assert_called_once_with(
+            [PlanModel], tool_choice={"type": "tool", "name": "PlanModel"}
+        )
+
+        await close_llm()
+
+        assert get_llm.cache_info().currsize == 0
+        assert get_tool_llm.cache_info().currsize == 0
+
+
+@pytest.mark.asyncio
+async def test_close_llm_leaves_shared_http_client_usable(mock_settings):
+    await close_llm()
+    chat_http_client = get_llm()._async_client._client
+    raw_client = get_async_anthropic()
+
+    await close_llm()
+
+    assert raw_client.is_closed()
+    assert get_llm()._async_client._client is chat_http_client
+    assert not chat_http_client.is_closed
+    await close_llm()
+
+
+@pytest.mark.asyncio
+async def test_plan_issues_batch_maps_results_back_to_states(mock_settings):
+    async def results(batch_id):
+        # Results may arrive in any order; they are matched back by custom_id.
+        yield SimpleNamespace(
+            custom_id="plan-1",
+            result=SimpleNamespace(type="errored", error="overloaded"),
+        )
+        yield SimpleNamespace(
+            custom_id="plan-0",
+            result=SimpleNamespace(
+                type="succeeded",
+                message=SimpleNamespace(
+                    content=[
+                        SimpleNamespace(
+                            type="tool_use",
+                            name="PlanModel",
+                            input={
+                                "definition_of_done": ["Done"],
+                                "steps": ["Step"],
+                                "target_files": ["file.py"],
+                                "estimated_complexity": "low",
+                            },
+                        )
+                    ]
+                ),
+            ),
+        )
+
+    client = AsyncMock()
+    client.messages.batches.create.return_value = SimpleNamespace(
+        id="batch-1", processing_status="in_progress"
+    )
+    client.messages.batches.retrieve.return_value = SimpleNamespace(
+        id="batch-1", processing_status="ended"
+    )
+    client.messages.batches.results.side_effect = lambda batch_id: results(batch_id)
+
+    states: list[GraphState] = [
+        {"issue": {"title": "First", "body": "Body", "number": 1}},
+        {"issue": {"title": "Second", "body": "Body", "number": 2}},
+    ]
+    with patch("multiplai.nodes.plan_issue.get_async_anthropic", return_value=client):
+        updates = await plan_issues_batch(states, poll_interval_seconds=0)
+
+    requests = client.messages.batches.create.call_args.kwargs["requests"]
+    assert [r["custom_id"] for r in requests] == ["plan-0", "plan-1"]
+    assert requests[0]["params"]["tool_choice"] == {"type": "tool", "name": "PlanModel"}
+    assert updates[0]["status"] == "planned"
+    assert updates[0]["plan"]["target_files"] == ["file.py"]
+    assert updates[1]["status"] == "error"
+    assert "overloaded" in updates[1]["error"]
+
+
+def test_repository_context_is_clipped_to_src_files_first():
+    tree = "\n".join(
+        [
+            "repo/",
+            "  README.md",
+            "  docs/",
+            *[f"    guide_{n}.md" for n in range(200)],
+            "  src/",
+            "    auth/",
+            "      login.py",
+            "    billing.py",
+        ]
+    )
+
+    clipped, dropped = _fit_repository_context(tree, max_tokens=20)
+
+    assert clipped.splitlines() == [
+        "repo/",
+        "  README.md",
+        "  src/",
+        "    auth/",
+        "      login.py",
+        "    billing.py",
+        "... (truncated to fit the context budget)",
+    ]
+    assert dropped == [f"docs/guide_{n}.md" for n in range(200)]
+    assert _fit_repository_context("repo/\n  a.py", max_tokens=20) == ("repo/\n  a.py", [])
+
+
+@pytest.mark.asyncio
+async def test_plan_issue_keeps_repository_context_stable_across_issues(
+    mock_settings, mock_chat_anthropic
+):
+    mock_settings.return_value.max_repository_context_tokens = 7
+    tree = "\n".join(
+        ["repo/", "  src/", "    app.py", "  docs/", "    setup_guide.md", "    faq.md"]
+    )
+    plan = PlanModel(definition_of_done=[], steps=[], target_files=[], estimated_complexity="low")
+    mock_chat_anthropic.ainvoke.return_value = _plan_message(plan.model_dump())
+
+    user_contents = []
+    for title in ("Improve the setup guide", "Fix the login bug"):
+        await plan_issue({"issue": {"title": title}, "context": {"file_tree": tree}})
+        _, user_message = mock_chat_anthropic.ainvoke.call_args.args[0]
+        user_contents.append(user_message.content)
+
+    # The cached block is identical; issue-relevant dropped files follow the breakpoint.
+    assert user_contents[0][0] == user_contents[1][0]
+    assert user_contents[0][1]["text"].endswith(
+        "Relevant files not shown in the repository context:\n- docs/setup_guide.md"
+    )
+    assert "Relevant files" not in user_contents[1][1]["text"]
+
+
+@pytest.mark.asyncio
+async def test_plan_issue_reuses_loaded_file_tree(mock_settings, mock_chat_anthropic):
+    state: GraphState = {
+        "issue": {"title": "Test Issue", "body": "Description", "number": 1},
+        "context": {"file_tree": "repo/\n  loaded.py"},
+    }
+    plan = PlanModel(definition_of_done=[], steps=[], target_files=[], estimated_complexity="low")
+    mock_chat_anthropic.ainvoke.return_value = _plan_message(plan.model_dump())
+
+    with patch("multiplai.nodes.plan_issue.get_repository_context") as scan:
+        await plan_issue(state)
+
+    scan.assert_not_called()
+    _, user_message = mock_chat_anthropic.ainvoke.call_args.args[0]
+    assert user_message.content[0]["text"] == "Repository Context:\nrepo/\n  loaded.py"
+
+
+def test_issue_fields_come_from_the_issue_then_flat_state():
+    issue = SimpleNamespace(title="Crash", number=7)
+
+    assert _normalize_issue(issue) == {"title": "Crash", "body": "", "number": "7"}
+    assert _normalize_issue({"title": "Crash", "number": 7}) == _normalize_issue(issue)
+    assert _normalize_issue(None) == {}
+
+    state: GraphState = {"issue": issue, "issue_body": "Stack trace", "issue_number": 8}
+    assert _extract_issue(state) == ("Crash", "Stack trace", "7")
+    assert _extract_issue({}) == ("Unknown Title", "No description provided.", "Unknown")
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+
+from multiplai.rate_limit import AsyncRateLimiter
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    fake = _FakeClock()
+    with (
+        patch("multiplai.rate_limit.time.monotonic", fake.monotonic),
+        patch("multiplai.rate_limit.asyncio.sleep", fake.sleep),
+    ):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_request_capacity(clock):
+    limiter = AsyncRateLimiter(requests_per_minute=2, tokens_per_minute=1_000)
+
+    await limiter.acquire(10)
+    await limiter.acquire(10)
+    assert clock.sleeps == []
+
+    await limiter.acquire(10)
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_token_capacity(clock):
+    limiter = AsyncRateLimiter(requests_per_minute=100, tokens_per_minute=1_000)
+
+    await limiter.acquire(900)
+    await limiter.acquire(400)
+
+    # 300 more tokens are needed at 1000 tokens/minute.
+    assert sum(clock.sleeps) == pytest.approx(18.0)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_admits_oversized_requests_when_full(clock):
+    limiter = AsyncRateLimiter(requests_per_minute=100, tokens_per_minute=1_000)
+
+    await limiter.acquire(5_000)
+    assert clock.sleeps == []
+
+
+def test_rate_limiter_rejects_non_positive_limits():
+    with pytest.raises(ValueError):
+        AsyncRateLimiter(requests_per_minute=0, tokens_per_minute=1_000)
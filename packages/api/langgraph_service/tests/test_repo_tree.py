@@ -0,0 +1,65 @@
+import pytest
+
+from multiplai.nodes.load_context import load_context
+from multiplai.repo_tree import _build_tree_cached, _scan_repository_tree, get_repository_context
+
+
+def test_repository_context_is_cached_until_tree_changes(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("")
+    _build_tree_cached.cache_clear()
+
+    first = get_repository_context(str(tmp_path))
+    second = get_repository_context(str(tmp_path))
+
+    assert first == second
+    assert "a.py" in first
+    assert _build_tree_cached.cache_info().hits == 1
+
+    (tmp_path / "src" / "b.py").write_text("")
+    assert "b.py" in get_repository_context(str(tmp_path))
+
+
+def test_repository_context_scans_uncached_when_fingerprinting_fails(tmp_path, monkeypatch):
+    assert get_repository_context(str(tmp_path / "missing")) == ""
+
+    (tmp_path / "a.py").write_text("")
+
+    def vanished(root_dir):
+        raise FileNotFoundError(root_dir)
+
+    monkeypatch.setattr("multiplai.repo_tree._tree_signature", vanished)
+    assert "a.py" in get_repository_context(str(tmp_path))
+
+
+def test_repository_tree_skips_excluded_dirs_and_stops_at_file_cap(tmp_path):
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "vendored.ts").write_text("")
+    (tmp_path / "coverage").mkdir()
+    (tmp_path / "coverage" / "report.json").write_text("")
+    (tmp_path / "src").mkdir()
+    for n in range(600):
+        (tmp_path / "src" / f"module_{n}.py").write_text("")
+
+    tree = _scan_repository_tree(str(tmp_path))
+
+    assert "vendored.ts" not in tree
+    assert "report.json" not in tree
+    assert tree.count(".py") == 501
+    assert tree.endswith("... (truncated)")
+
+
+@pytest.mark.asyncio
+async def test_load_context_stores_the_repository_tree(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("")
+    monkeypatch.chdir(tmp_path)
+    _build_tree_cached.cache_clear()
+
+    update = await load_context({"context": {"loaded": True}, "error": "previous failure"})
+
+    assert update["status"] == "context_loaded"
+    assert update["error"] is None
+    assert update["context"]["loaded"] is True
+    assert update["context"]["file_tree"] == get_repository_context(".")
+    assert "    app.py" in update["context"]["file_tree"]
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from multiplai.schemas import (
+    Complexity,
+    ExecutionPlan,
+    Job,
+    JobStatus,
+    Task,
+    TaskStatus,
+    to_api_dict,
+)
+
+
+def test_execution_plan_accepts_legacy_complexity_strings():
+    plan = ExecutionPlan(steps=[], target_files=[], estimated_complexity="medium")
+
+    assert plan.estimated_complexity is Complexity.MEDIUM
+    assert Complexity.HIGH > plan.estimated_complexity >= Complexity.MEDIUM
+    assert Complexity.parse(3) is Complexity.HIGH
+
+
+def test_complexity_rejects_unknown_values():
+    with pytest.raises(ValueError, match="Unknown complexity"):
+        Complexity.parse("trivial")
+    with pytest.raises(ValueError):
+        Complexity.parse(0)
+
+
+def test_statuses_are_ints_in_memory_and_strings_at_the_api():
+    now = datetime(2024, 1, 1)
+    task = Task(
+        id="t1",
+        status="PLANNING_DONE",
+        github_repo="owner/repo",
+        github_issue_number=1,
+        github_issue_title="Title",
+        created_at=now,
+        updated_at=now,
+    )
+    job = Job(id="j1", status="running", task_ids=["t1"], created_at=now, updated_at=now)
+
+    assert task.status is TaskStatus.PLANNING_DONE
+    assert task.status > TaskStatus.PLANNING
+    assert job.status is JobStatus.RUNNING
+    assert TaskStatus("NEW") is TaskStatus.NEW
+    assert JobStatus("cancelled") is JobStatus.CANCELLED
+    with pytest.raises(ValueError):
+        JobStatus("CANCELLED")
+    assert to_api_dict(task)["status"] == "PLANNING_DONE"
+    assert to_api_dict(job) == {
+        "id": "j1",
+        "status": "running",
+        "task_ids": ["t1"],
+        "completed_count": 0,
+        "failed_count": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def test_records_reject_unknown_statuses_with_value_error():
+    now = datetime(2024, 1, 1)
+    with pytest.raises(ValueError, match="Unknown task status"):
+        Task(
+            id="t1",
+            status="bogus",
+            github_repo="owner/repo",
+            github_issue_number=1,
+            github_issue_title="Title",
+            created_at=now,
+            updated_at=now,
+        )
+    with pytest.raises(ValueError, match="Unknown job status"):
+        Job(id="j1", status="bogus", task_ids=[], created_at=now, updated_at=now)
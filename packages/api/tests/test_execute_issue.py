@@ -1,24 +1,56 @@
-
+import asyncio
 import os
 import unittest
 import tempfile
-from unittest.mock import MagicMock, patch, AsyncMock
-from multiplai.nodes.execute_issue import execute_issue
+from unittest.mock import MagicMock, patch
+from multiplai.llm import get_llm
+from multiplai.nodes.execute_issue import (
+    _FILE_CACHE,
+    _RESPONSE_CACHE,
+    _read_file,
+    _render_plan,
+    execute_issue,
+)
+from multiplai.schemas import Complexity
+
+
+def _streaming_llm(respond):
+    """Build a mock LLM whose `astream` yields the chunks returned by `respond(messages)`."""
+    mock_llm = MagicMock()
+
+    async def astream(messages):
+        for text in respond(messages):
+            yield MagicMock(content=text)
+
+    mock_llm.astream.side_effect = astream
+    return mock_llm
+
 
 class TestExecuteIssue(unittest.IsolatedAsyncioTestCase):
 
-    @patch("multiplai.nodes.execute_issue.ChatAnthropic")
+    def setUp(self):
+        llm_settings_patcher = patch("multiplai.llm.get_settings")
+        self.mock_llm_settings = llm_settings_patcher.start()
+        self.mock_llm_settings.return_value.anthropic_api_key = "test_key"
+        self.addCleanup(llm_settings_patcher.stop)
+        get_llm.cache_clear()
+        _RESPONSE_CACHE.clear()
+        _FILE_CACHE.clear()
+
+    def tearDown(self):
+        get_llm.cache_clear()
+        _RESPONSE_CACHE.clear()
+        _FILE_CACHE.clear()
+
+    @patch("langchain_anthropic.ChatAnthropic")
     @patch("multiplai.nodes.execute_issue.get_settings")
     async def test_execute_issue_success(self, mock_get_settings, MockChatAnthropic):
         # Setup mocks
         mock_settings = MagicMock()
-        mock_settings.anthropic_api_key = "test_key"
+        mock_settings.max_context_tokens = 100_000
         mock_get_settings.return_value = mock_settings
 
-        mock_llm = AsyncMock()
-        mock_response = MagicMock()
-        mock_response.content = "mocked diff"
-        mock_llm.ainvoke.return_value = mock_response
+        mock_llm = _streaming_llm(lambda messages: ["mocked ", "diff"])
         MockChatAnthropic.return_value = mock_llm
 
         # Create temporary file
@@ -38,8 +70,258 @@ class TestExecuteIssue(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(new_state["diff"], "mocked diff")
 
             # Verify LLM interaction
-            MockChatAnthropic.assert_called_with(api_key="test_key", model="claude-3-5-sonnet-20240620")
-            mock_llm.ainvoke.assert_called_once()
+            MockChatAnthropic.assert_called_with(api_key="test_key", model="claude-3-5-sonnet-20240620", max_retries=2)
+            mock_llm.astream.assert_called_once()
+
+            # Static prefix is marked for Anthropic prompt caching; the plan is not
+            system_msg, human_msg = mock_llm.astream.call_args.args[0]
+            self.assertEqual(system_msg["content"][0]["cache_control"], {"type": "ephemeral"})
+            file_block, plan_block = human_msg["content"]
+            self.assertIn("original content", file_block["text"])
+            self.assertEqual(file_block["cache_control"], {"type": "ephemeral"})
+            self.assertTrue(plan_block["text"].startswith("Plan:"))
+            self.assertIn('"steps": [\n    "change file"\n  ]', plan_block["text"])
+            self.assertNotIn("cache_control", plan_block)
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_execute_issue_reuses_cached_diff(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 100_000
+        mock_llm = _streaming_llm(lambda messages: ["mocked ", "diff"])
+        MockChatAnthropic.return_value = mock_llm
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("original content")
+            tmp_file_path = tmp_file.name
+
+        state = {
+            "plan": {"steps": ["change file"]},
+            "target_files": [tmp_file_path]
+        }
+
+        try:
+            first_state = await execute_issue(state)
+            second_state = await execute_issue(state)
+
+            self.assertEqual(first_state["diff"], "mocked diff")
+            self.assertEqual(second_state["diff"], "mocked diff")
+            mock_llm.astream.assert_called_once()
+
+            # Changing the file contents invalidates the cached diff
+            with open(tmp_file_path, "w", encoding="utf-8") as f:
+                f.write("updated content")
+            await execute_issue(state)
+            self.assertEqual(mock_llm.astream.call_count, 2)
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_concurrent_executions_get_their_own_diff(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 100_000
+        def respond(messages):
+            _, human_msg = messages
+            return [f"diff for {human_msg['content'][0]['text'].splitlines()[0]}"]
+
+        mock_llm = _streaming_llm(respond)
+        MockChatAnthropic.return_value = mock_llm
+
+        tmp_file_paths = []
+        for content in ("first", "second"):
+            with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+                tmp_file.write(content)
+                tmp_file_paths.append(tmp_file.name)
+
+        try:
+            states = await asyncio.gather(
+                *(
+                    execute_issue({"plan": {"steps": ["change file"]}, "target_files": [path]})
+                    for path in tmp_file_paths
+                )
+            )
+
+            self.assertEqual(mock_llm.astream.call_count, 2)
+            for path, new_state in zip(tmp_file_paths, states):
+                self.assertEqual(new_state["status"], "executed")
+                self.assertEqual(new_state["diff"], f"diff for File: {path}")
+
+        finally:
+            for path in tmp_file_paths:
+                os.remove(path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_execute_issue_reports_client_errors(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 100_000
+        MockChatAnthropic.side_effect = RuntimeError("bad credentials")
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("original content")
+            tmp_file_path = tmp_file.name
+
+        try:
+            new_state = await asyncio.wait_for(
+                execute_issue({"plan": {"steps": ["change file"]}, "target_files": [tmp_file_path]}),
+                timeout=5,
+            )
+
+            self.assertEqual(new_state["status"], "error")
+            self.assertIn("bad credentials", new_state["error"])
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_execute_issue_stops_streaming_after_closing_fence(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 100_000
+        consumed = []
+
+        def respond(messages):
+            for text in ["```diff\n", "+new line\n`", "``\nHere is", " an explanation"]:
+                consumed.append(text)
+                yield text
+
+        MockChatAnthropic.return_value = _streaming_llm(respond)
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("original content")
+            tmp_file_path = tmp_file.name
+
+        try:
+            new_state = await execute_issue(
+                {"plan": {"steps": ["change file"]}, "target_files": [tmp_file_path]}
+            )
+
+            self.assertEqual(new_state["status"], "executed")
+            self.assertEqual(new_state["diff"], "+new line")
+            self.assertNotIn(" an explanation", consumed)
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_execute_issue_keeps_fences_inside_hunks(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 100_000
+        diff = (
+            "--- a/README.md\n"
+            "+++ b/README.md\n"
+            "@@ -1 +1,4 @@\n"
+            " # Project\n"
+            "+Usage:\n"
+            "+```bash\n"
+            "+make test\n"
+            "+```"
+        )
+        chunks = ["```diff\n", diff[:60], diff[60:], "\n`", "``\n", "Done."]
+        MockChatAnthropic.return_value = _streaming_llm(lambda messages: chunks)
+
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("# Project\n")
+            tmp_file_path = tmp_file.name
+
+        try:
+            new_state = await execute_issue(
+                {"plan": {"steps": ["document usage"]}, "target_files": [tmp_file_path]}
+            )
+
+            self.assertEqual(new_state["status"], "executed")
+            self.assertEqual(new_state["diff"], diff)
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    @patch("multiplai.nodes.execute_issue.get_settings")
+    async def test_execute_issue_excerpts_oversized_files(self, mock_get_settings, MockChatAnthropic):
+        mock_get_settings.return_value.max_context_tokens = 200
+        mock_llm = _streaming_llm(lambda messages: ["mocked diff"])
+        MockChatAnthropic.return_value = mock_llm
+
+        lines = [f"filler_line_{n} = {n}" for n in range(500)]
+        lines[250] = "def rename_target_function():"
+        lines[10] = "steps = high"
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("\n".join(lines))
+            tmp_file_path = tmp_file.name
+
+        state = {
+            "plan": {"steps": ["Update rename_target_function"], "estimated_complexity": "high"},
+            "target_files": [tmp_file_path]
+        }
+
+        try:
+            new_state = await execute_issue(state)
+
+            self.assertEqual(new_state["status"], "executed")
+            _, human_msg = mock_llm.astream.call_args.args[0]
+            file_text = human_msg["content"][0]["text"]
+            self.assertIn("251: def rename_target_function():", file_text)
+            self.assertIn("(lines 1-", file_text)
+            self.assertNotIn("filler_line_0 ", file_text)
+            # Plan keys and the complexity level are not keywords.
+            self.assertNotIn("steps = high", file_text)
+            self.assertLess(len(file_text), len("\n".join(lines)))
+
+        finally:
+            os.remove(tmp_file_path)
+
+    @patch("langchain_anthropic.ChatAnthropic")
+    def test_llm_client_is_reused(self, MockChatAnthropic):
+        self.assertIs(get_llm(), get_llm())
+        MockChatAnthropic.assert_called_once()
+
+    def test_plan_is_rendered_without_enum_reprs(self):
+        rendered = _render_plan({"steps": ["a"], "estimated_complexity": Complexity.LOW})
+
+        self.assertIn('"estimated_complexity": "low"', rendered)
+        self.assertNotIn("Complexity", rendered)
+        self.assertEqual(_render_plan("Rename the helper"), "Rename the helper")
+
+    def test_read_file_handles_short_reads(self):
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("a" * 100)
+            tmp_file_path = tmp_file.name
+
+        real_read = os.read
+        try:
+            with patch("os.read", side_effect=lambda fd, n: real_read(fd, min(n, 7))):
+                self.assertEqual(_read_file(tmp_file_path), "a" * 100)
+        finally:
+            os.remove(tmp_file_path)
+
+    def test_read_file_serves_unchanged_files_from_cache(self):
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("original content")
+            tmp_file_path = tmp_file.name
+
+        try:
+            self.assertEqual(_read_file(tmp_file_path), "original content")
+            with patch("multiplai.nodes.execute_issue.os.open") as mock_open:
+                self.assertEqual(_read_file(tmp_file_path), "original content")
+                mock_open.assert_not_called()
+
+            with open(tmp_file_path, "w", encoding="utf-8") as f:
+                f.write("updated content!")
+            self.assertEqual(_read_file(tmp_file_path), "updated content!")
+
+        finally:
+            os.remove(tmp_file_path)
+
+    def test_read_file_does_not_cache_large_files(self):
+        with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_file:
+            tmp_file.write("x" * 64)
+            tmp_file_path = tmp_file.name
+
+        try:
+            with patch("multiplai.nodes.execute_issue._FILE_CACHE_MAX_FILE_BYTES", 32):
+                self.assertEqual(_read_file(tmp_file_path), "x" * 64)
+            self.assertNotIn(tmp_file_path, _FILE_CACHE)
 
         finally:
             os.remove(tmp_file_path)